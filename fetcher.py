@@ -1,16 +1,93 @@
-import requests
-import pandas as pd
+import asyncio
+import functools
 import time
 from datetime import date, timedelta, datetime, timezone, time as dtime
 from calendar import monthrange
 from collections import defaultdict
 
+import httpx
+import ijson
+import numpy as np
+import orjson
+import pyarrow as pa
+import redis
+
 from storage import OptionStorage
 from config.settings import ASSETS
 
 
 DERIBIT_API = "https://www.deribit.com/api/v2"
 
+# 호출 시마다 f-string으로 다시 만들지 않도록 엔드포인트 URL을 상수로 고정
+URL_INDEX_PRICE = f"{DERIBIT_API}/public/get_index_price"
+URL_BOOK_CCY = f"{DERIBIT_API}/public/get_book_summary_by_currency"
+URL_INSTRUMENTS = f"{DERIBIT_API}/public/get_instruments"
+
+# Deribit의 산발적 5xx/429에 대비한 재시도 대상 상태 코드
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# 스냅샷 스키마: 반복 문자열은 dictionary 인코딩, 수치는 FP32
+# (OI 스냅샷에서 greeks의 float64 정밀도는 의미가 없고 저장량만 2배)
+SNAPSHOT_SCHEMA = pa.schema([
+    ("Expiry", pa.dictionary(pa.int16(), pa.string())),
+    ("Instrument", pa.dictionary(pa.int32(), pa.string())),
+    ("Strike", pa.float32()),
+    ("Type", pa.dictionary(pa.int8(), pa.string())),
+    ("OI", pa.float32()),
+    ("Delta", pa.float32()),
+    ("Gamma", pa.float32()),
+    ("Theta", pa.float32()),
+    ("Vega", pa.float32()),
+    ("IV", pa.float32()),
+])
+
+
+class TokenBucket:
+    """
+    고정 sleep 대신 토큰 버킷으로 요청 속도를 제어합니다.
+    버킷에 토큰이 있으면 즉시 통과, 비었을 때만 리필될 때까지 대기.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            await asyncio.sleep(wait)
+
+
+# Deribit 비매칭 엔진 rate limit에 맞춘 공용 버킷 (이벤트 루프 내에서 공유)
+BUCKET = TokenBucket(rate=20, capacity=40)
+
+
+async def _get_json(session, url, params=None):
+    """GET + orjson 디코드. 429/5xx와 연결 오류는 backoff를 두고 3회 재시도."""
+    for attempt in range(4):
+        try:
+            await BUCKET.acquire()
+            resp = await session.get(url, params=params)
+            if resp.status_code in RETRY_STATUSES and attempt < 3:
+                await asyncio.sleep(0.3 * (2 ** attempt))
+                continue
+            resp.raise_for_status()
+            return orjson.loads(resp.content)
+        except httpx.TransportError:
+            if attempt >= 3:
+                raise
+            await asyncio.sleep(0.3 * (2 ** attempt))
+
 
 # =========================================================
 # EXPIRY CALCULATION (TARGET, CALENDAR-BASED)
@@ -20,6 +97,12 @@ def to_deribit_expiry(dt: date) -> str:
     return dt.strftime("%d%b%y").upper()
 
 
+@functools.lru_cache(maxsize=512)
+def _parse_expiry(s: str) -> date:
+    """Deribit 만기 문자열("27MAR26") 파싱 결과를 캐시합니다 (strptime이 의외로 비쌈)."""
+    return datetime.strptime(s, "%d%b%y").date()
+
+
 def calculate_target_expiries(today_dt: date | None = None) -> list[str]:
     if today_dt is None:
         today_dt = datetime.now(timezone.utc)
@@ -36,7 +119,7 @@ def calculate_target_expiries(today_dt: date | None = None) -> list[str]:
 
     this_friday = today_date + timedelta(days=days_until_friday)
     expiries["near"] = this_friday
-    
+
     # 🚀 추가: 다음 주 금요일 (연속성 확보)
     expiries["next_week"] = this_friday + timedelta(days=7)
 
@@ -55,37 +138,148 @@ def calculate_target_expiries(today_dt: date | None = None) -> list[str]:
     return [to_deribit_expiry(d) for d in sorted(set(expiries.values()))]
 
 
+@functools.lru_cache(maxsize=1)
+def _target_expiries_for_day(ordinal: int) -> list[str]:
+    # UTC 날짜 ordinal을 키로 받아 자정에 캐시가 자연스럽게 무효화되도록 함
+    return calculate_target_expiries()
+
+
+async def get_target_expiries():
+    """오늘의 타깃 만기 목록. 프로세스 내 lru + Redis(12h TTL)로 공유합니다."""
+    today = datetime.now(timezone.utc).date()
+
+    async def _compute():
+        return _target_expiries_for_day(today.toordinal())
+
+    return await _cached(f"deribit:target_expiries:{today:%Y%m%d}", 43200, _compute)
+
+
 # =========================================================
 # DERIBIT HELPERS
 # =========================================================
 
-def get_deribit_price(asset):
-    url = f"{DERIBIT_API}/public/get_index_price"
-    params = {"index_name": f"{asset.lower()}_usd"}
+async def get_deribit_price(session, asset):
     try:
-        r = requests.get(url, params=params, timeout=10)
-        r.raise_for_status()
-        return float(r.json()["result"]["index_price"])
+        js = await _get_json(
+            session,
+            URL_INDEX_PRICE,
+            params={"index_name": f"{asset.lower()}_usd"},
+        )
+        return float(js["result"]["index_price"])
     except Exception as e:
         print(f"[ERROR] Price fetch failed ({asset}): {e}")
         return None
 
 
-def get_available_expiries_with_oi(asset):
+# 한 번의 실행(run) 안에서 asset별 대용량 응답을 재사용하기 위한 캐시
+_RUN_CACHE = {}
+
+
+def _clear_run_cache():
+    _RUN_CACHE.clear()
+
+
+# Redis가 있으면 반복 실행(cron) 간에도 응답을 공유 (없으면 조용히 비활성화)
+try:
+    R = redis.Redis()
+    R.ping()
+except Exception:
+    R = None
+
+
+async def _cached(key, ttl, fn):
+    """Redis에 key가 살아있으면 그 값을, 아니면 await fn() 결과를 TTL과 함께 저장 후 반환."""
+    if R is None:
+        return await fn()
+    try:
+        val = R.get(key)
+        if val is not None:
+            return orjson.loads(val)
+    except Exception:
+        return await fn()
+    val = await fn()
+    try:
+        R.setex(key, ttl, orjson.dumps(val))
+    except Exception:
+        pass
+    return val
+
+
+async def get_book_summary_by_currency(session, asset):
+    """자산 전체 옵션의 요약(OI, IV, greeks)을 한 번의 벌크 호출로 가져옵니다."""
+    key = ("book_summary", asset)
+    if key not in _RUN_CACHE:
+        js = await _get_json(
+            session,
+            URL_BOOK_CCY,
+            params={"currency": asset, "kind": "option"},
+        )
+        _RUN_CACHE[key] = js.get("result", [])
+    return _RUN_CACHE[key]
+
+
+class _AsyncByteReader:
     """
-    모든 악기의 요약 정보를 한 번에 가져와서
-    만기별 전체 OI 합계를 효율적으로 계산합니다.
+    httpx의 aiter_bytes()를 ijson의 비동기 입력 규약(read 코루틴을 가진
+    파일류 객체)에 맞추는 어댑터. ijson은 빈 bytes를 EOF로 해석하므로
+    청크를 받은 그대로 넘기면 됩니다.
     """
+
+    def __init__(self, aiter):
+        self._aiter = aiter
+
+    async def read(self, n=-1):
+        # ijson은 시작할 때 read(0)으로 bytes/str 판별만 하므로 소비 금지
+        if n == 0:
+            return b""
+        try:
+            return await self._aiter.__anext__()
+        except StopAsyncIteration:
+            return b""
+
+
+async def _fetch_instruments(session, asset):
+    # 스트리밍 경로는 _get_json을 못 타므로 같은 재시도 정책을 직접 적용
+    for attempt in range(4):
+        try:
+            await BUCKET.acquire()
+            async with session.stream(
+                "GET", URL_INSTRUMENTS,
+                params={"currency": asset, "kind": "option"},
+            ) as resp:
+                if resp.status_code in RETRY_STATUSES and attempt < 3:
+                    await asyncio.sleep(0.3 * (2 ** attempt))
+                    continue
+                resp.raise_for_status()
+                # 응답 전체를 dict로 올리지 않고 result 배열을 스트리밍하면서
+                # 유효한 옵션 악기만 남김 (버릴 행은 아예 만들지 않음)
+                return [
+                    i async for i in ijson.items(
+                        _AsyncByteReader(resp.aiter_bytes()), "result.item", use_float=True
+                    )
+                    if i["instrument_name"].count("-") == 3
+                ]
+        except httpx.TransportError:
+            if attempt >= 3:
+                raise
+            await asyncio.sleep(0.3 * (2 ** attempt))
+
+
+async def get_instruments(session, asset):
+    """자산 전체 옵션 악기 목록 (만기별 반복 조회 없이 run당 1회만 요청)."""
+    key = ("instruments", asset)
+    if key not in _RUN_CACHE:
+        # 악기 목록은 만기일에만 바뀌므로 5분 TTL이면 충분히 안전
+        _RUN_CACHE[key] = await _cached(
+            f"deribit:instruments:{asset}", 300,
+            lambda: _fetch_instruments(session, asset),
+        )
+    return _RUN_CACHE[key]
+
+
+async def _compute_expiry_oi(session, asset):
     # 개별 악기가 아닌 자산(BTC, ETH) 전체 요약을 한 번에 요청
-    url = f"{DERIBIT_API}/public/get_book_summary_by_currency"
-    params = {"currency": asset, "kind": "option"}
-    
-    try:
-        resp = requests.get(url, params=params, timeout=10).json()
-        results = resp.get("result", [])
-    except Exception as e:
-        print(f"[ERROR] Failed to fetch book summary: {e}")
-        return {}
+    results = await get_book_summary_by_currency(session, asset)
 
     expiry_oi = defaultdict(float)
 
@@ -95,7 +289,7 @@ def get_available_expiries_with_oi(asset):
             name = item["instrument_name"]
             expiry = name.split("-")[1]
             oi = item.get("open_interest", 0)
-            
+
             expiry_oi[expiry] += oi
         except (IndexError, KeyError):
             continue
@@ -103,122 +297,186 @@ def get_available_expiries_with_oi(asset):
     return dict(expiry_oi)
 
 
+async def get_available_expiries_with_oi(session, asset):
+    """
+    모든 악기의 요약 정보를 한 번에 가져와서
+    만기별 전체 OI 합계를 효율적으로 계산합니다.
+    """
+    try:
+        return await _cached(
+            f"deribit:expiry_oi:{asset}", 60,
+            lambda: _compute_expiry_oi(session, asset),
+        )
+    except Exception as e:
+        print(f"[ERROR] Failed to fetch book summary: {e}")
+        return {}
+
+
 def select_best_expiry(target_expiry: str, expiry_oi_map: dict) -> str | None:
     try:
-        target_dt = datetime.strptime(target_expiry, "%d%b%y").date()
+        target_dt = _parse_expiry(target_expiry)
     except Exception:
         return None
 
-    candidates = []
+    # 전체 후보 리스트를 만들어 정렬하는 대신 한 번의 순회로 최솟값만 추적
+    best = None
+    best_key = None
     for expiry, oi in expiry_oi_map.items():
         try:
-            dt = datetime.strptime(expiry, "%d%b%y").date()
-            delta_days = abs((dt - target_dt).days)
-            candidates.append((delta_days, -oi, expiry))
+            dt = _parse_expiry(expiry)
+            key = (abs((dt - target_dt).days), -oi)
         except Exception:
             continue
+        if best_key is None or key < best_key:
+            best_key, best = key, expiry
 
-    if not candidates:
-        return None
+    return best
 
-    candidates.sort()
-    return candidates[0][2]
 
+def filter_future_expiries(expiries, today=None):
+    """
+    만기 목록에서 오늘(UTC) 이전 만기를 걸러내고 날짜순으로 반환합니다.
+    datetime64 배열 한 번의 비교로 처리 (개별 strptime/isoformat 비교 제거).
+    """
+    if today is None:
+        today = datetime.now(timezone.utc).date()
 
-def get_deribit_options(asset, expiry, sleep_sec=0.01):
-    inst_resp = requests.get(
-        f"{DERIBIT_API}/public/get_instruments",
-        params={"currency": asset, "kind": "option"},
-        timeout=10
-    ).json()
+    expiries = list(dict.fromkeys(expiries))
+    if not expiries:
+        return []
 
-    instruments = [
-        i for i in inst_resp.get("result", [])
-        if expiry in i["instrument_name"]
-        and i["instrument_name"].count("-") == 3
-    ]
+    expiries_np = np.array([_parse_expiry(e) for e in expiries], dtype="datetime64[D]")
+    mask = expiries_np >= np.datetime64(today, "D")
+    return sorted((e for e, m in zip(expiries, mask) if m), key=_parse_expiry)
+
+
+def index_instruments_by_expiry(instruments):
+    """악기 목록을 1회 순회해 만기별로 인덱싱 → 만기당 조회가 O(1)."""
+    by_expiry = {}
+    for i in instruments:
+        # 서브스트링 매칭("1JAN26" in "31JAN26" 오탐 가능) 대신 만기 필드 정확 비교
+        parts = i["instrument_name"].split("-", 3)
+        if len(parts) == 4:
+            by_expiry.setdefault(parts[1], []).append(i)
+    return by_expiry
 
-    rows = []
-    for inst in instruments:
-        name = inst["instrument_name"]
-        try:
-            bs = requests.get(
-                f"{DERIBIT_API}/public/get_book_summary_by_instrument",
-                params={"instrument_name": name},
-                timeout=10
-            ).json()
-
-            if not bs.get("result"): continue
-            oi = bs["result"][0].get("open_interest", 0)
-
-            tk = requests.get(
-                f"{DERIBIT_API}/public/ticker",
-                params={"instrument_name": name},
-                timeout=10
-            ).json()
-
-            greeks = tk.get("result", {}).get("greeks", {})
-            rows.append({
-                "Expiry": expiry, "Instrument": name, "Strike": inst["strike"],
-                "Type": inst["option_type"].lower(), "OI": oi,
-                "Delta": greeks.get("delta", 0.0), "Gamma": greeks.get("gamma", 0.0),
-                "Theta": greeks.get("theta", 0.0), "Vega": greeks.get("vega", 0.0),
-                "IV": tk.get("result", {}).get("mark_iv", 0.0)
-            })
-            if sleep_sec > 0: time.sleep(sleep_sec)
-        except Exception as e:
-            print(f"[WARN] Skip {name}: {e}")
-
-    return pd.DataFrame(rows)
+
+async def get_deribit_options(session, asset, expiry, instruments_by_expiry=None):
+    if instruments_by_expiry is None:
+        instruments_by_expiry = index_instruments_by_expiry(await get_instruments(session, asset))
+
+    instruments = instruments_by_expiry.get(expiry, [])
+    inst_meta = {i["instrument_name"]: i for i in instruments}
+
+    # 악기별 개별 호출(book_summary + ticker) 대신 벌크 요약 1회로 전부 커버
+    try:
+        summary = await get_book_summary_by_currency(session, asset)
+    except Exception as e:
+        print(f"[ERROR] Failed to fetch book summary: {e}")
+        summary = []
+
+    # dict 행 리스트 + pd.DataFrame(rows) 대신 컬럼(SoA) 단위로 쌓아서
+    # pandas 타입 추론/BlockManager 복사 없이 Arrow RecordBatch로 반환
+    instruments_col, strikes, types = [], [], []
+    oi, delta, gamma, theta, vega, iv = [], [], [], [], [], []
+
+    meta_get = inst_meta.get  # 루프 내 attribute 재조회 방지
+
+    for item in summary:
+        name = item.get("instrument_name", "")
+        inst = meta_get(name)
+        if inst is None:
+            continue
+        instruments_col.append(name)
+        strikes.append(float(inst["strike"]))
+        types.append(inst["option_type"].lower())
+        oi.append(float(item.get("open_interest", 0)))
+        delta.append(float(item.get("delta", 0.0)))
+        gamma.append(float(item.get("gamma", 0.0)))
+        theta.append(float(item.get("theta", 0.0)))
+        vega.append(float(item.get("vega", 0.0)))
+        iv.append(float(item.get("mark_iv", 0.0)))
+
+    table = pa.Table.from_arrays(
+        [
+            pa.array([expiry] * len(instruments_col), type=pa.string()),
+            pa.array(instruments_col, type=pa.string()),
+            pa.array(strikes, type=pa.float32()),
+            pa.array(types, type=pa.string()),
+            pa.array(oi, type=pa.float32()),
+            pa.array(delta, type=pa.float32()),
+            pa.array(gamma, type=pa.float32()),
+            pa.array(theta, type=pa.float32()),
+            pa.array(vega, type=pa.float32()),
+            pa.array(iv, type=pa.float32()),
+        ],
+        names=SNAPSHOT_SCHEMA.names,
+    )
+    return table.cast(SNAPSHOT_SCHEMA)
 
 
 # =========================================================
 # MAIN FETCH LOOP (MARKET-AWARE)
 # =========================================================
 
-def fetch_and_store_all_expiries():
+async def main():
     storage = OptionStorage()
-    
+    _clear_run_cache()
+
     # 수집 전 DB 유지보수 실행
     print("🧹 Running pre-fetch database maintenance...")
     storage.maintain_db(live_days=7) # 최근 7일치 유지
 
-    for asset in ASSETS:
-        print(f"--- 🚀 Starting Fetch for {asset} ---")
-        
-        target_expiries = calculate_target_expiries()
-        expiry_oi_map = get_available_expiries_with_oi(asset)
-
-        resolved_expiries = []
-        for target in target_expiries:
-            best = select_best_expiry(target, expiry_oi_map)
-            if best:
-                resolved_expiries.append(best)
-
-        today_str = datetime.now(timezone.utc).date().isoformat()
-        resolved_expiries = sorted(
-            {e for e in resolved_expiries if datetime.strptime(e, "%d%b%y").date().isoformat() >= today_str},
-            key=lambda x: datetime.strptime(x, "%d%b%y")
-        )
+    # HTTP/2 멀티플렉싱: 동시 요청들이 하나의 TCP+TLS 커넥션 위 스트림으로 실림
+    async with httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=10, max_connections=50),
+        timeout=15.0,
+    ) as session:
+        # 타깃 만기는 자산과 무관 → 루프 밖에서 하루 1회만 계산
+        target_expiries = await get_target_expiries()
+
+        for asset in ASSETS:
+            print(f"--- 🚀 Starting Fetch for {asset} ---")
+
+            # 가격과 만기별 OI는 서로 독립 → 동시에 요청
+            spot_price, expiry_oi_map = await asyncio.gather(
+                get_deribit_price(session, asset),
+                get_available_expiries_with_oi(session, asset),
+            )
+
+            resolved_expiries = []
+            for target in target_expiries:
+                best = select_best_expiry(target, expiry_oi_map)
+                if best:
+                    resolved_expiries.append(best)
+
+            resolved_expiries = filter_future_expiries(resolved_expiries)
+
+            if spot_price is None:
+                print(f"[ERROR] Could not get spot price for {asset}")
+                continue
 
-        spot_price = get_deribit_price(asset)
-        if spot_price is None:
-            print(f"[ERROR] Could not get spot price for {asset}")
-            continue
+            # 악기 목록은 asset당 1회만 내려받아 만기별로 인덱싱
+            by_expiry = index_instruments_by_expiry(await get_instruments(session, asset))
 
-        for expiry in resolved_expiries:
-            print(f"📡 Fetching {asset} options ({expiry})")
-            df = get_deribit_options(asset, expiry)
-            if df.empty:
-                print(f"[WARN] No data for {asset} - {expiry}")
-                continue
+            # 만기별 수집은 서로 독립적인 I/O 작업이므로 한 이벤트 루프에서 겹쳐 실행
+            batches = await asyncio.gather(
+                *[get_deribit_options(session, asset, e, by_expiry) for e in resolved_expiries]
+            )
 
-            storage.save_snapshot(df=df, asset=asset, spot_price=spot_price)
-            time.sleep(0.5)
+            for expiry, batch in zip(resolved_expiries, batches):
+                if batch.num_rows == 0:
+                    print(f"[WARN] No data for {asset} - {expiry}")
+                    continue
 
+                print(f"📡 Fetched {asset} options ({expiry})")
+                storage.save_snapshot(df=batch, asset=asset, spot_price=spot_price)
 
-if __name__ == "__main__":
-    fetch_and_store_all_expiries()
 
+def fetch_and_store_all_expiries():
+    asyncio.run(main())
 
 
+if __name__ == "__main__":
+    fetch_and_store_all_expiries()
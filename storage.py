@@ -1,168 +1,608 @@
+import functools
+import shutil
 import sqlite3
+import threading
+import time
 from pathlib import Path
 from datetime import datetime, date, timedelta, timezone
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Arrow에서 넘어온 float32/int 계열 스칼라를 sqlite3가 바인딩할 수 있도록 등록
+sqlite3.register_adapter(np.float32, float)
+sqlite3.register_adapter(np.int64, int)
+sqlite3.register_adapter(np.int32, int)
+
+
+@functools.lru_cache(maxsize=512)
+def _expiry_days(expiry):
+    """'26DEC26' 형식 만기를 epoch 일수로. 만기 종류는 스냅샷당 수십 개뿐이라
+    프로세스 수명 동안 거의 모든 호출이 캐시에서 해결됩니다."""
+    return (datetime.strptime(expiry, "%d%b%y").date() - date(1970, 1, 1)).days
 
 
 class OptionStorage:
-    def __init__(self, db_dir="database"):
+    # timestamp: Unix epoch ms, expiry_iso: epoch 기준 일수.
+    # TEXT 비교(바이트 단위) 대신 정수 비교 → 인덱스가 절반 크기로 줄고
+    # WHERE timestamp < ? 류 스캔이 I/O 기준으로 약 2배 빨라짐
+    #
+    # 악기 고정 속성(instrument/expiry/strike/type/asset)은 수백 종뿐인데
+    # 스냅샷 행마다 반복 저장되던 것을 instrument_dim으로 정규화.
+    # fact 행은 instrument_id 정수 하나만 가리켜 행당 ~40바이트 절약.
+    DIM_TABLE_SQL = """
+        CREATE TABLE IF NOT EXISTS instrument_dim (
+            instrument_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            instrument TEXT UNIQUE NOT NULL,
+            asset TEXT NOT NULL,
+            expiry TEXT NOT NULL,
+            expiry_iso INTEGER NOT NULL,
+            strike REAL NOT NULL,
+            type TEXT CHECK(type IN ('c','p')) NOT NULL
+        );
+    """
+
+    # WITHOUT ROWID: (timestamp, instrument_id) PK가 곧 저장 순서라
+    # 별도 rowid 컬럼과 UNIQUE 보조 인덱스가 사라지고,
+    # timestamp 범위 조회가 테이블 b-tree를 바로 탑니다.
+    LIVE_TABLE_SQL = """
+        CREATE TABLE IF NOT EXISTS oi_snapshots (
+            timestamp INTEGER NOT NULL,
+            instrument_id INTEGER NOT NULL REFERENCES instrument_dim(instrument_id),
+            spot_price REAL NOT NULL,
+            oi REAL NOT NULL,
+            delta REAL NOT NULL,
+            gamma REAL NOT NULL,
+            theta REAL NOT NULL,
+            vega REAL NOT NULL,
+            iv REAL NOT NULL,
+            PRIMARY KEY (timestamp, instrument_id)
+        ) WITHOUT ROWID;
+    """
+
+    ARCHIVE_TABLE_SQL = """
+        CREATE TABLE IF NOT EXISTS oi_snapshots_archive (
+            id INTEGER,
+            timestamp INTEGER,
+            asset TEXT,
+            spot_price REAL,
+            expiry TEXT,
+            expiry_iso INTEGER,
+            instrument TEXT,
+            strike REAL,
+            type TEXT,
+            oi REAL,
+            delta REAL,
+            gamma REAL,
+            theta REAL,
+            vega REAL,
+            iv REAL
+        );
+    """
+
+    # 매 호출마다 f-string으로 SQL을 새로 조립하면 sqlite3의 내부
+    # prepared-statement 캐시(동일 문자열 기준 LRU)를 매번 비껴갑니다.
+    # 핫 패스 INSERT는 한 번만 조립해 항상 같은 객체를 넘깁니다.
+    FACT_INSERT_COLS = ("timestamp", "instrument_id", "spot_price", "oi", "delta", "gamma", "theta", "vega", "iv")
+    STMT_INSERT_FACT = (
+        f"INSERT OR IGNORE INTO oi_snapshots ({','.join(FACT_INSERT_COLS)}) "
+        f"VALUES ({','.join('?' * len(FACT_INSERT_COLS))})"
+    )
+    STMT_INSERT_DIM = (
+        "INSERT OR IGNORE INTO instrument_dim (instrument, asset, expiry, expiry_iso, strike, type) "
+        "VALUES (?,?,?,?,?,?)"
+    )
+
+    def __init__(self, db_dir="database", archive_to_parquet=False):
         self.live_path = Path(db_dir) / "live.db"
         self.archive_path = Path(db_dir) / "archive.db"
+        self.parquet_dir = Path(db_dir) / "parquet"
+        # 아카이브는 append-only 콜드 데이터라 컬럼 포맷이 더 잘 맞음.
+        # True면 만료 데이터를 archive.db 대신 (asset, 연-월) 파티션의
+        # zstd Parquet으로 내리고, 보존 기간 삭제는 파일 unlink로 끝남.
+        self.archive_to_parquet = archive_to_parquet
+        self.archive_parquet_dir = Path(db_dir) / "archive_parquet"
         self.live_path.parent.mkdir(parents=True, exist_ok=True)
 
         self._init_live_db()
-        self._init_archive_db()
+        if not archive_to_parquet:
+            self._init_archive_db()
+
+        # 호출마다 재연결하면 스키마 파싱/PRAGMA 적용/페이지 캐시 웜업을
+        # 매번 다시 치릅니다. 연결을 열어두고 재사용합니다.
+        # 쓰기는 단일 연결 + _lock으로 직렬화하고, 읽기는 스레드별
+        # 읽기 전용 연결을 따로 둡니다 — WAL에서는 reader가 writer와
+        # 경합하지 않으므로 대시보드 조회가 insert 뒤에서 기다리지 않음.
+        self._lock = threading.Lock()
+        self._live_conn = self._connect(self.live_path)
+        self._archive_conn = None if archive_to_parquet else self._connect(self.archive_path)
+        self._read_local = threading.local()
+
+    # -----------------------------
+    # CONNECTION
+    # -----------------------------
+    def _connect(self, path):
+        """
+        WAL + 완화된 동기화로 연결합니다.
+        WAL은 reader가 writer를 막지 않고, synchronous=NORMAL은
+        커밋마다의 fsync를 제거해 수집 루프의 지연을 크게 줄입니다.
+        """
+        conn = sqlite3.connect(path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")       # DB 파일에 영구 적용
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-65536")      # 64MB 페이지 캐시
+        conn.execute("PRAGMA mmap_size=268435456")    # 256MB mmap
+        conn.execute("PRAGMA wal_autocheckpoint=1000")  # WAL을 ~4MB 수준으로 유지
+        conn.execute("PRAGMA cache_spill=FALSE")      # 버스트 중 더티 페이지를 디스크로 밀지 않음
+        return conn
+
+    def _connect_ro(self, path):
+        """
+        조회 전용 연결. mode=ro + query_only로 실수로라도 쓰기가 불가능해
+        writer의 커밋 경로를 절대 막지 않고, 저널 관련 부기도 생략됩니다.
+        mmap 덕에 대량 스캔(load_timeseries)이 read() 시스템콜 없이 돕니다.
+        """
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30)
+        conn.execute("PRAGMA query_only=1")
+        conn.execute("PRAGMA mmap_size=268435456")
+        return conn
+
+    def _live_read_conn(self):
+        conn = getattr(self._read_local, "conn", None)
+        if conn is None:
+            conn = self._connect_ro(self.live_path)
+            self._read_local.conn = conn
+        return conn
+
+    def close(self):
+        for conn in (self._live_conn, self._archive_conn):
+            if conn is None:
+                continue
+            try:
+                conn.execute("PRAGMA optimize")
+                conn.close()
+            except Exception:
+                pass
 
     # -----------------------------
     # DB INIT
     # -----------------------------
     def _init_live_db(self):
-        with sqlite3.connect(self.live_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS oi_snapshots (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    asset TEXT NOT NULL,
-                    spot_price REAL NOT NULL,
-                    expiry TEXT NOT NULL,
-                    expiry_iso TEXT NOT NULL,
-                    instrument TEXT NOT NULL,
-                    strike REAL NOT NULL,
-                    type TEXT CHECK(type IN ('call','put')) NOT NULL,
-                    oi REAL NOT NULL,
-                    delta REAL NOT NULL,
-                    gamma REAL NOT NULL,
-                    theta REAL NOT NULL,  
-                    vega REAL NOT NULL,  
-                    iv REAL NOT NULL,
-                    UNIQUE(timestamp, instrument)
-                );
-            """)
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_ts_asset ON oi_snapshots (timestamp, asset)")
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_expiry_iso ON oi_snapshots (expiry_iso)")
+        with self._connect(self.live_path) as conn:
+            # 새 DB라면 테이블 생성 전에 적용되어야 함 (기존 DB는 compact=True 시 반영)
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute(self.DIM_TABLE_SQL)
+            conn.execute(self.LIVE_TABLE_SQL)
+            self._migrate_live_schema(conn)
+            self._migrate_dim_type_char(conn)
+            self._migrate_fact_without_rowid(conn)
+            # timestamp 단독 인덱스는 PK 선두 컬럼이 대체하므로 불필요
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_fact_inst_ts ON oi_snapshots (instrument_id, timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_dim_asset ON instrument_dim (asset)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_dim_expiry_iso ON instrument_dim (expiry_iso)")
+            # 유지보수 마지막 실행 시각 등 소량의 상태 저장용
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
             conn.commit()
 
     def _init_archive_db(self):
-        with sqlite3.connect(self.archive_path) as conn:
+        with self._connect(self.archive_path) as conn:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
             # 보관용 DB이므로 UNIQUE 제약조건은 제거하여 유연하게 저장합니다.
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS oi_snapshots_archive (
-                    id INTEGER,
-                    timestamp TEXT,
-                    asset TEXT,
-                    spot_price REAL,
-                    expiry TEXT,
-                    expiry_iso TEXT,
-                    instrument TEXT,
-                    strike REAL,
-                    type TEXT,
-                    oi REAL,
-                    delta REAL,
-                    gamma REAL,
-                    theta REAL,  
-                    vega REAL,
-                    iv REAL
-                );
-            """)
+            conn.execute(self.ARCHIVE_TABLE_SQL)
+            self._migrate_epoch_schema(conn, "oi_snapshots_archive", self.ARCHIVE_TABLE_SQL)
             conn.commit()
 
+    def _migrate_epoch_schema(self, conn, table, create_sql):
+        """
+        구버전(TEXT timestamp/expiry_iso) 테이블을 INTEGER epoch 스키마로
+        1회 재작성합니다. 이미 마이그레이션된 DB에서는 no-op.
+        """
+        cols = {row[1]: (row[2] or "").upper() for row in conn.execute(f"PRAGMA table_info({table})")}
+        if cols.get("timestamp") != "TEXT":
+            return
+
+        legacy = f"{table}_legacy"
+        print(f"🔧 Migrating {table} to epoch-integer schema...")
+        conn.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+        conn.execute(create_sql)
+        # ms 정밀도가 없던 구버전 행이 같은 초에 겹치면 UNIQUE로 걸러냄
+        conn.execute(f"""
+            INSERT OR IGNORE INTO {table}
+                (id, timestamp, asset, spot_price, expiry, expiry_iso,
+                 instrument, strike, type, oi, delta, gamma, theta, vega, iv)
+            SELECT id,
+                   CAST(strftime('%s', timestamp) AS INTEGER) * 1000,
+                   asset, spot_price, expiry,
+                   CAST(strftime('%s', expiry_iso) AS INTEGER) / 86400,
+                   instrument, strike, type, oi, delta, gamma, theta, vega, iv
+            FROM {legacy}
+        """)
+        conn.execute(f"DROP TABLE {legacy}")
+        conn.commit()
+
+    def _migrate_live_schema(self, conn):
+        """
+        비정규화된 구 oi_snapshots(TEXT 또는 epoch 스키마)를
+        instrument_dim + fact 구조로 1회 재작성합니다.
+        """
+        cols = {row[1]: (row[2] or "").upper() for row in conn.execute("PRAGMA table_info(oi_snapshots)")}
+        if "instrument" not in cols:
+            return
+
+        # epoch 마이그레이션 이전의 TEXT 스키마에서 바로 올 수도 있음
+        text_schema = cols.get("timestamp") == "TEXT"
+        ts_expr = "CAST(strftime('%s', o.timestamp) AS INTEGER) * 1000" if text_schema else "o.timestamp"
+        exp_expr = "CAST(strftime('%s', expiry_iso) AS INTEGER) / 86400" if text_schema else "expiry_iso"
+
+        print("🔧 Migrating oi_snapshots to instrument_dim + fact schema...")
+        conn.execute(f"""
+            INSERT OR IGNORE INTO instrument_dim (instrument, asset, expiry, expiry_iso, strike, type)
+            SELECT DISTINCT instrument, asset, expiry, {exp_expr}, strike, substr(type, 1, 1)
+            FROM oi_snapshots
+        """)
+        conn.execute("ALTER TABLE oi_snapshots RENAME TO oi_snapshots_legacy")
+        conn.execute(self.LIVE_TABLE_SQL)
+        conn.execute(f"""
+            INSERT OR IGNORE INTO oi_snapshots
+                (timestamp, instrument_id, spot_price, oi, delta, gamma, theta, vega, iv)
+            SELECT {ts_expr}, d.instrument_id, o.spot_price,
+                   o.oi, o.delta, o.gamma, o.theta, o.vega, o.iv
+            FROM oi_snapshots_legacy o
+            JOIN instrument_dim d ON d.instrument = o.instrument
+        """)
+        conn.execute("DROP TABLE oi_snapshots_legacy")
+        conn.commit()
+
+    def _migrate_dim_type_char(self, conn):
+        """
+        'call'/'put'으로 저장된 기존 dim의 type을 'c'/'p' 1글자 코드로
+        1회 재작성합니다 (CHECK 제약이 테이블 정의에 박혀 있어 재생성 필요).
+        instrument_id는 fact가 참조하므로 그대로 보존합니다.
+        """
+        row = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'instrument_dim'"
+        ).fetchone()
+        if row is None or "'call'" not in row[0]:
+            return
+
+        print("🔧 Migrating instrument_dim.type to single-char codes...")
+        conn.execute("ALTER TABLE instrument_dim RENAME TO instrument_dim_legacy")
+        conn.execute(self.DIM_TABLE_SQL)
+        conn.execute("""
+            INSERT INTO instrument_dim (instrument_id, instrument, asset, expiry, expiry_iso, strike, type)
+            SELECT instrument_id, instrument, asset, expiry, expiry_iso, strike, substr(type, 1, 1)
+            FROM instrument_dim_legacy
+        """)
+        conn.execute("DROP TABLE instrument_dim_legacy")
+        conn.commit()
+
+    def _migrate_fact_without_rowid(self, conn):
+        """
+        id 컬럼이 있는 rowid 기반 fact 테이블을 (timestamp, instrument_id)
+        PK의 WITHOUT ROWID 테이블로 1회 재작성합니다.
+        """
+        cols = {row[1] for row in conn.execute("PRAGMA table_info(oi_snapshots)")}
+        if "id" not in cols:
+            return
+
+        print("🔧 Migrating oi_snapshots to WITHOUT ROWID schema...")
+        conn.execute("ALTER TABLE oi_snapshots RENAME TO oi_snapshots_legacy")
+        conn.execute(self.LIVE_TABLE_SQL)
+        conn.execute("""
+            INSERT OR IGNORE INTO oi_snapshots
+                (timestamp, instrument_id, spot_price, oi, delta, gamma, theta, vega, iv)
+            SELECT timestamp, instrument_id, spot_price, oi, delta, gamma, theta, vega, iv
+            FROM oi_snapshots_legacy
+        """)
+        conn.execute("DROP TABLE oi_snapshots_legacy")
+        conn.commit()
+
     # -----------------------------
     # MAINTENANCE (ARCHIVE & CLEANUP)
     # -----------------------------
-    def maintain_db(self, live_days=7, archive_retain_days=30):
+    MAINTENANCE_INTERVAL_HOURS = 24
+
+    def maintain_db(self, live_days=7, archive_retain_days=30, compact=False, force=False):
         """
         Theta 분석을 위해 최근 7일치 데이터는 live.db에 유지.
         만기가 지났거나 7일이 넘은 데이터는 archive.db로 이동 후 삭제.
+        compact=True(주간 cron 용)일 때만 전체 VACUUM을 수행합니다.
+
+        하루 단위 작업이므로 마지막 실행 후 24시간이 지나기 전에는
+        no-op입니다 (force=True로 강제 실행 가능). 수집 경로에서
+        실수로 매 스냅샷마다 호출되더라도 비용이 들지 않습니다.
         """
         today_dt = datetime.now(timezone.utc)
-        today_str = today_dt.date().isoformat()
+
+        if not force and not self._maintenance_due(today_dt):
+            return
+        today_days = (today_dt.date() - date(1970, 1, 1)).days
         # 7일 전 기준 시각 (Theta 분석을 위한 데이터 보존 기간)
-        cutoff_ts = (today_dt - timedelta(days=live_days)).isoformat()
-
-        # 1. Live -> Archive 이동 및 삭제
-        with sqlite3.connect(self.live_path) as conn_live:
-            # 만기가 지났거나 수집한 지 7일이 넘은 데이터 선택
-            query = "SELECT * FROM oi_snapshots WHERE expiry_iso < ? OR timestamp < ?"
-            to_move_df = pd.read_sql(query, conn_live, params=[today_str, cutoff_ts])
-            
-            if not to_move_df.empty:
-                with sqlite3.connect(self.archive_path) as conn_arch:
-                    to_move_df.to_sql("oi_snapshots_archive", conn_arch, if_exists="append", index=False)
-                
-                conn_live.execute("DELETE FROM oi_snapshots WHERE expiry_iso < ? OR timestamp < ?", [today_str, cutoff_ts])
-                print(f"📦 Archived and deleted {len(to_move_df)} rows from live.db")
-
-        # 2. Old Archive Data 삭제 (영구 삭제)
-        archive_limit = (today_dt - timedelta(days=archive_retain_days)).isoformat()
-        with sqlite3.connect(self.archive_path) as conn_arch:
-            cursor = conn_arch.execute("DELETE FROM oi_snapshots_archive WHERE timestamp < ?", [archive_limit])
-            if cursor.rowcount > 0:
-                print(f"🗑️ Deleted {cursor.rowcount} old rows from archive.db")
-
-        # 3. 🚀 VACUUM 처리 (물리적 파일 크기 축소 핵심)
-        for path in [self.live_path, self.archive_path]:
-            try:
-                conn = sqlite3.connect(path)
-                conn.isolation_level = None  
-                conn.execute("VACUUM")
-                conn.close()
-                print(f"🧹 Vacuumed: {path.name}")
-            except Exception as e:
-                print(f"[WARN] Vacuum failed for {path}: {e}")
+        cutoff_ts = int((today_dt - timedelta(days=live_days)).timestamp() * 1000)
+
+        with self._lock:
+            conn_live = self._live_conn
+            conn_arch = self._archive_conn
+
+            # 1. Live -> Archive 이동 및 삭제
+            if self.archive_to_parquet:
+                moved = self._archive_expired_to_parquet(conn_live, today_days, cutoff_ts)
+            else:
+                moved = self._archive_expired_to_sqlite(conn_live, today_days, cutoff_ts)
+            if moved > 0:
+                print(f"📦 Archived and deleted {moved} rows from live.db")
+
+            # 2. Old Archive Data 삭제 (영구 삭제)
+            if self.archive_to_parquet:
+                self._prune_parquet_archive(today_dt - timedelta(days=archive_retain_days))
+            else:
+                archive_limit = int((today_dt - timedelta(days=archive_retain_days)).timestamp() * 1000)
+                cursor = conn_arch.execute("DELETE FROM oi_snapshots_archive WHERE timestamp < ?", [archive_limit])
+                conn_arch.commit()
+                if cursor.rowcount > 0:
+                    print(f"🗑️ Deleted {cursor.rowcount} old rows from archive.db")
+
+            conns = [(conn_live, self.live_path.name)]
+            if conn_arch is not None:
+                conns.append((conn_arch, self.archive_path.name))
+
+            # WAL이 대량 이동/삭제로 커진 상태이므로 여기서 잘라냄
+            # (autocheckpoint만으로는 파일이 줄어들지 않음)
+            for conn, _ in conns:
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+            # 3. 공간 회수 + 플래너 통계 갱신
+            # 전체 VACUUM은 파일 전체를 다시 쓰므로 매 호출마다 돌리지 않고,
+            # 증분 vacuum과 PRAGMA optimize로 대체합니다.
+            for conn, name in conns:
+                try:
+                    if compact:
+                        conn.execute("VACUUM")
+                        print(f"🧹 Vacuumed: {name}")
+                    else:
+                        conn.execute("PRAGMA incremental_vacuum(1000)")
+                        conn.execute("PRAGMA optimize")
+                except Exception as e:
+                    print(f"[WARN] Vacuum failed for {name}: {e}")
+
+            self._mark_maintenance_run(today_dt)
+
+    def _archive_expired_to_sqlite(self, conn_live, today_days, cutoff_ts):
+        # 만기가 지났거나 수집한 지 live_days가 넘은 데이터를 pandas를 거치지
+        # 않고 ATTACH로 SQLite 엔진 안에서 파일 간 직접 복사
+        conn_live.execute("ATTACH DATABASE ? AS arch", [str(self.archive_path)])
+        try:
+            # 복사와 삭제를 하나의 트랜잭션으로 묶어 둘 사이에 끼어든
+            # save_snapshot 행이 아카이브 없이 지워지는 경합을 차단.
+            # BEGIN IMMEDIATE로 쓰기 락을 선점해 fsync도 한 번만 발생.
+            conn_live.execute("BEGIN IMMEDIATE")
+            # 아카이브는 외부에서 단독으로 읽을 수 있도록 비정규화 형태 유지
+            cursor = conn_live.execute(
+                """
+                INSERT INTO arch.oi_snapshots_archive
+                    (timestamp, asset, spot_price, expiry, expiry_iso,
+                     instrument, strike, type, oi, delta, gamma, theta, vega, iv)
+                SELECT o.timestamp, d.asset, o.spot_price, d.expiry, d.expiry_iso,
+                       d.instrument, d.strike, d.type, o.oi, o.delta, o.gamma, o.theta, o.vega, o.iv
+                FROM oi_snapshots o
+                JOIN instrument_dim d USING (instrument_id)
+                WHERE d.expiry_iso < ? OR o.timestamp < ?
+                """,
+                [today_days, cutoff_ts],
+            )
+            moved = cursor.rowcount
+            self._delete_expired_live(conn_live, today_days, cutoff_ts)
+            conn_live.commit()
+        finally:
+            # 트랜잭션이 열린 채로는 DETACH가 실패하므로 먼저 정리
+            if conn_live.in_transaction:
+                conn_live.rollback()
+            conn_live.execute("DETACH DATABASE arch")
+        return moved
+
+    def _archive_expired_to_parquet(self, conn_live, today_days, cutoff_ts):
+        # SELECT -> Parquet 쓰기 -> DELETE를 한 트랜잭션 안에서 수행해,
+        # 파일 쓰기가 실패하면 live 데이터도 그대로 남도록 함
+        conn_live.execute("BEGIN IMMEDIATE")
+        try:
+            expired_df = pd.read_sql(
+                """
+                SELECT o.timestamp, d.asset, o.spot_price, d.expiry, d.expiry_iso,
+                       d.instrument, d.strike, d.type, o.oi, o.delta, o.gamma, o.theta, o.vega, o.iv,
+                       strftime('%Y-%m', o.timestamp / 1000, 'unixepoch') AS ym
+                FROM oi_snapshots o
+                JOIN instrument_dim d USING (instrument_id)
+                WHERE d.expiry_iso < ? OR o.timestamp < ?
+                """,
+                conn_live,
+                params=[today_days, cutoff_ts],
+            )
+            if not expired_df.empty:
+                self.archive_parquet_dir.mkdir(parents=True, exist_ok=True)
+                table = pa.Table.from_pandas(expired_df, preserve_index=False)
+                pq.write_to_dataset(
+                    table,
+                    root_path=str(self.archive_parquet_dir),
+                    partition_cols=["asset", "ym"],
+                    compression="zstd",
+                )
+            self._delete_expired_live(conn_live, today_days, cutoff_ts)
+            conn_live.commit()
+        finally:
+            if conn_live.in_transaction:
+                conn_live.rollback()
+        return len(expired_df)
+
+    def _delete_expired_live(self, conn_live, today_days, cutoff_ts):
+        conn_live.execute(
+            "DELETE FROM oi_snapshots WHERE timestamp < ? OR instrument_id IN "
+            "(SELECT instrument_id FROM instrument_dim WHERE expiry_iso < ?)",
+            [cutoff_ts, today_days],
+        )
+        # 더 이상 fact가 참조하지 않는 만기 지난 악기는 dim에서도 제거
+        conn_live.execute(
+            "DELETE FROM instrument_dim WHERE expiry_iso < ? AND instrument_id NOT IN "
+            "(SELECT DISTINCT instrument_id FROM oi_snapshots)",
+            [today_days],
+        )
+
+    def _prune_parquet_archive(self, limit_dt):
+        # 연-월 파티션 디렉터리째로 지우므로 삭제 비용은 행 수와 무관.
+        # 월 단위라 보존 경계가 다소 거칠지만 콜드 데이터에는 충분합니다.
+        limit_ym = limit_dt.strftime("%Y-%m")
+        removed = 0
+        for ym_dir in self.archive_parquet_dir.glob("asset=*/ym=*"):
+            if ym_dir.name.split("=", 1)[1] < limit_ym:
+                shutil.rmtree(ym_dir)
+                removed += 1
+        if removed > 0:
+            print(f"🗑️ Deleted {removed} old partitions from {self.archive_parquet_dir.name}")
+
+    def _maintenance_due(self, now_dt):
+        with self._lock:
+            row = self._live_conn.execute("SELECT value FROM meta WHERE key = 'maintain_last_run'").fetchone()
+        if row is None:
+            return True
+        last_run = datetime.fromisoformat(row[0])
+        return now_dt - last_run >= timedelta(hours=self.MAINTENANCE_INTERVAL_HOURS)
+
+    def _mark_maintenance_run(self, now_dt):
+        # maintain_db가 _lock을 쥔 상태에서 호출됨
+        self._live_conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('maintain_last_run', ?)",
+            [now_dt.isoformat()],
+        )
+        self._live_conn.commit()
                 
     # -----------------------------
     # SAVE
     # -----------------------------
     def save_snapshot(self, df, asset, spot_price):
-        ts = datetime.utcnow().isoformat(timespec="milliseconds")
-        df = df.copy()
-        df["timestamp"] = ts
-        df["asset"] = asset
-        df["spot_price"] = spot_price
-        df["expiry_iso"] = df["Expiry"].apply(
-            lambda x: datetime.strptime(x, "%d%b%y").date().isoformat()
-        )
+        # fetcher가 Arrow RecordBatch를 넘기는 경우를 위한 얇은 어댑터
+        if not isinstance(df, pd.DataFrame):
+            df = df.to_pandas()
+
+        ts = int(time.time() * 1000)  # Unix epoch ms
+
+        # frame 전체를 copy/rename하지 않고 필요한 컬럼만 투영
+        # (호출자는 변형된 frame을 다시 읽지 않으므로 복사는 순수 낭비)
+        # pd.to_datetime의 캐시는 호출마다 새로 만들어지지만, lru_cache는
+        # 프로세스 수명 동안 유지되어 다음 스냅샷부터는 파싱이 0회에 수렴
+        expiry_iso = df["Expiry"].map(_expiry_days).to_numpy(dtype="int64")
+        instruments = df["Instrument"].to_numpy()
+        expiries = df["Expiry"].to_numpy()
+        strikes = df["Strike"].to_numpy(dtype="float64")
+        # CHECK 비교와 저장 모두 1바이트면 충분 ('call'/'put' → 'c'/'p')
+        types = df["Type"].str[0].to_numpy()
+        # 마샬링 비용 축소: greeks/OI는 float32면 충분 (DB 컬럼은 그대로 REAL)
+        oi = df["OI"].to_numpy(dtype="float32")
+        delta = df["Delta"].to_numpy(dtype="float32")
+        gamma = df["Gamma"].to_numpy(dtype="float32")
+        theta = df["Theta"].to_numpy(dtype="float32")
+        vega = df["Vega"].to_numpy(dtype="float32")
+        iv = df["IV"].to_numpy(dtype="float32")
+        n = len(instruments)
 
-        df = df.rename(columns={
-            "Expiry": "expiry",
-            "Instrument": "instrument",
-            "Strike": "strike",
-            "Type": "type",
-            "OI": "oi",
-            "Delta": "delta",
-            "Gamma": "gamma",
-            "Theta": "theta",
-            "Vega": "vega",
-            "IV": "iv",
-        })
+        # 새 악기만 dim에 upsert (스냅샷당 수백 행 → 보통 전부 no-op)
+        dim_records = []
+        seen = set()
+        for name, exp, eiso, strike, typ in zip(instruments, expiries, expiry_iso, strikes, types):
+            if name in seen:
+                continue
+            seen.add(name)
+            dim_records.append((name, asset, exp, int(eiso), float(strike), typ))
 
-        cols = ["timestamp", "asset", "spot_price", "expiry", "expiry_iso", "instrument", "strike", "type", "oi", "delta", "gamma", "theta", "vega", "iv"]
+        with self._lock:
+            conn = self._live_conn
+            conn.execute("BEGIN")
+            conn.executemany(self.STMT_INSERT_DIM, dim_records)
 
-        with sqlite3.connect(self.live_path) as conn:
-            df[cols].to_sql("oi_snapshots", conn, if_exists="append", index=False)
+            # instrument → instrument_id 매핑을 붙여 fact 행 구성
+            id_map = dict(conn.execute(
+                "SELECT instrument, instrument_id FROM instrument_dim WHERE asset = ?", [asset]
+            ).fetchall())
+
+            # to_sql/merge 브리지 없이 컬럼 배열을 그대로 zip → executemany
+            # (prepared statement 재사용, 중복 수집은 UNIQUE 제약으로 무시)
+            payload = list(zip(
+                [ts] * n,
+                (id_map[name] for name in instruments),
+                [float(spot_price)] * n,
+                oi, delta, gamma, theta, vega, iv,
+            ))
+            conn.executemany(self.STMT_INSERT_FACT, payload)
+            conn.commit()
 
         print(f"📦 Saved {len(df)} rows @ {ts}")
-        # self.maintain_db()
+
+    def save_snapshot_arrow(self, table, asset, spot_price):
+        """
+        SQLite 경로 대신 Expiry로 파티셔닝된 Parquet 데이터셋으로 저장.
+        dictionary 인코딩 + 컬럼 저장이라 분석용 재조회에 유리합니다.
+        """
+        ts = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+        n = table.num_rows
+        table = (
+            table
+            .append_column("timestamp", pa.array([ts] * n, type=pa.string()))
+            .append_column("asset", pa.array([asset] * n, type=pa.string()))
+            .append_column("spot_price", pa.array([float(spot_price)] * n, type=pa.float32()))
+        )
+
+        pq.write_to_dataset(table, root_path=str(self.parquet_dir), partition_cols=["Expiry"])
+        print(f"📦 Saved {n} rows (parquet) @ {ts}")
 
     # -----------------------------
     # LOAD
     # -----------------------------
+    # fact/dim 컬럼 구분 (load 쿼리의 별칭 결정용)
+    FACT_COLUMNS = frozenset({"timestamp", "spot_price", "oi", "delta", "gamma", "theta", "vega", "iv"})
+    DIM_COLUMNS = frozenset({"asset", "expiry", "expiry_iso", "instrument", "strike", "type"})
+
     def load_latest(self, asset="BTC", expiry=None):
-        query = "SELECT * FROM oi_snapshots WHERE asset = ? AND timestamp = (SELECT MAX(timestamp) FROM oi_snapshots WHERE asset = ?)"
+        # MAX() 대신 ORDER BY ... LIMIT 1 서브쿼리 → 인덱스를 그대로 사용
+        query = (
+            "SELECT o.timestamp, d.asset, o.spot_price, d.expiry, d.expiry_iso, d.instrument, "
+            "d.strike, d.type, o.oi, o.delta, o.gamma, o.theta, o.vega, o.iv "
+            "FROM oi_snapshots o JOIN instrument_dim d USING (instrument_id) "
+            "WHERE d.asset = ? AND o.timestamp = ("
+            "  SELECT o2.timestamp FROM oi_snapshots o2"
+            "  JOIN instrument_dim d2 USING (instrument_id)"
+            "  WHERE d2.asset = ? ORDER BY o2.timestamp DESC LIMIT 1)"
+        )
         params = [asset, asset]
         if expiry:
-            query += " AND expiry = ?"
+            query += " AND d.expiry = ?"
             params.append(expiry)
-        with sqlite3.connect(self.live_path) as conn:
-            return pd.read_sql(query, conn, params=params)
+        return pd.read_sql(query, self._live_read_conn(), params=params)
 
-    def load_timeseries(self, asset="BTC", expiry=None):
-        query = "SELECT * FROM oi_snapshots WHERE asset = ?"
+    def load_timeseries(self, asset="BTC", expiry=None, columns=None):
+        """
+        분석 호출자는 대개 14개 컬럼 중 4~6개만 쓰므로 SELECT * 대신
+        필요한 컬럼만 투영하고, 대용량 결과는 청크로 나눠 읽습니다.
+        """
+        if columns is None:
+            columns = ("timestamp", "strike", "type", "oi", "delta", "gamma")
+        invalid = set(columns) - self.FACT_COLUMNS - self.DIM_COLUMNS
+        if invalid:
+            raise ValueError(f"Unknown columns: {sorted(invalid)}")
+
+        select_exprs = [
+            f"o.{c}" if c in self.FACT_COLUMNS else f"d.{c}" for c in columns
+        ]
+        query = (
+            f"SELECT {','.join(select_exprs)} FROM oi_snapshots o "
+            "JOIN instrument_dim d USING (instrument_id) WHERE d.asset = ?"
+        )
         params = [asset]
         if expiry:
-            query += " AND expiry = ?"
+            query += " AND d.expiry = ?"
             params.append(expiry)
-        query += " ORDER BY timestamp ASC"
-        with sqlite3.connect(self.live_path) as conn:
-            return pd.read_sql(query, conn, params=params)
+        query += " ORDER BY o.timestamp ASC"
+        chunks = list(pd.read_sql(query, self._live_read_conn(), params=params, chunksize=50_000))
+        if not chunks:
+            return pd.DataFrame(columns=list(columns))
+        return pd.concat(chunks, ignore_index=True)
 